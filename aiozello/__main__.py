@@ -117,7 +117,7 @@ def fix_callbacks(callbacks):
 
 
 class Application:
-    def __init__(self, token, username, password, channels = None, callbacks=None):
+    def __init__(self, token, username, password, channels = None, callbacks=None, tracer=None):
         self.token = token
         self.username = username
         self.password = password
@@ -128,6 +128,7 @@ class Application:
         self.sequence = 0
         self.streams = dict()
         self.requests = dict()
+        self.tracer = tracer
 
     async def run(self):
         async with aiohttp.ClientSession() as session:
@@ -153,8 +154,14 @@ class Application:
                                 ) = codec_header
                                 stream_id = data["stream_id"]
                                 stream = IncomingAudioStream(
-                                    sample_rate_hz, frames_per_packet, frame_size_ms
+                                    sample_rate_hz,
+                                    frames_per_packet,
+                                    frame_size_ms,
+                                    channel=data.get("channel"),
+                                    from_=data.get("from"),
                                 )
+                                if self.tracer is not None:
+                                    stream.trace = self.tracer.stream(stream_id, stream)
                                 self.streams[stream_id] = stream
                                 asyncio.create_task(self.callbacks["on_stream"](stream_id, stream))
                             elif command == "on_stream_stop":
@@ -171,10 +178,16 @@ class Application:
                     elif msg.type == aiohttp.WSMsgType.CLOSED:
                         await self.callbacks["on_ws_closed"](msg)
                     elif msg.type == aiohttp.WSMsgType.BINARY:
+                        if self.tracer is not None:
+                            received = self.tracer.now()
                         stream_packet, id1, id2, data = decode_stream_packet(msg.data)
                         if stream_packet is PacketType.AUDIO:
                             stream = self.streams[id1]
-                            await stream.incoming.put(data)
+                            if stream.trace is None:
+                                await stream.incoming.put(data)
+                            else:
+                                stamp = stream.trace.received(id2, received)
+                                await stream.incoming.put((data, stamp))
                         elif stream_packet is PacketType.IMAGE:
                             await self.callbacks["on_image"](id1, data)
                         else:
@@ -0,0 +1,331 @@
+"""
+This module contains the classes related to archiving incoming audio streams.
+
+The :class:`AudioArchive` class appends the raw Opus packets of every stream
+to large rolling segment files and keeps a compact binary index of the
+archived streams, so they can be looked up by channel, sender and time range
+and read back through `mmap` without copying.
+
+On disk an archive is a directory holding the `index` file, the `strings`
+file and the `segment-NNNNNN` files.  Inside a segment every packet is
+prefixed by its length as an unsigned 16-bit integer, and the packets of a
+stream are stored contiguously.  The index is an array of fixed-width
+records, appended as streams end and therefore ordered by end time, with the
+channel and sender stored as ids into the `strings` table.  The index is
+memory-mapped and searched in place, so opening an archive doesn't read its
+whole history.
+
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+
+INDEX_FILENAME = "index"
+STRINGS_FILENAME = "strings"
+SEGMENT_FILENAME = "segment-{:06d}"
+DEFAULT_SEGMENT_SIZE = 256 * 1024 * 1024
+
+INDEX_RECORD = np.dtype(
+    [
+        ("stream_id", "<u4"),
+        ("start_time", "<f8"),
+        ("end_time", "<f8"),
+        ("segment", "<u4"),
+        ("offset", "<u8"),
+        ("length", "<u4"),
+        ("sample_rate_hz", "<u2"),
+        ("frames_per_packet", "u1"),
+        ("frame_size_ms", "u1"),
+        ("channel", "<u4"),
+        ("from_", "<u4"),
+    ]
+)
+STRING_HEADER = struct.Struct("<H")
+PACKET_HEADER = struct.Struct("<H")
+
+
+@dataclass(frozen=True)
+class ArchiveEntry:
+    stream_id: int
+    start_time: float
+    end_time: float
+    segment: int
+    offset: int
+    length: int
+    sample_rate_hz: int
+    frames_per_packet: int
+    frame_size_ms: int
+    channel: str
+    from_: str
+
+
+def encode_string(string):
+    """
+    Encodes a string of the string table as a length-prefixed record.
+    """
+    data = string.encode()
+    return STRING_HEADER.pack(len(data)) + data
+
+
+def decode_strings(data):
+    """
+    Decodes all the complete string records found in `data`.
+
+    Returns the decoded strings and the position where the last complete
+    record ends; a truncated trailing record, as left by an interrupted
+    write, is not decoded.
+    """
+    strings = []
+    position = 0
+    while position + STRING_HEADER.size <= len(data):
+        (length,) = STRING_HEADER.unpack_from(data, position)
+        if position + STRING_HEADER.size + length > len(data):
+            break
+        position += STRING_HEADER.size
+        strings.append(bytes(data[position : position + length]).decode())
+        position += length
+    return strings, position
+
+
+def truncate_to(path, size):
+    # Drop a truncated record so new records aren't appended to it
+    if os.path.getsize(path) > size:
+        os.truncate(path, size)
+
+
+def encode_packets(packets):
+    """
+    Encodes a sequence of Opus packets as length-prefixed records.
+    """
+    return b"".join(PACKET_HEADER.pack(len(packet)) + packet for packet in packets)
+
+
+def iter_packets(data):
+    """
+    Yields the packets of a length-prefixed buffer as slices of `data`.
+    """
+    view = memoryview(data)
+    position = 0
+    while position < len(view):
+        (length,) = PACKET_HEADER.unpack_from(view, position)
+        position += PACKET_HEADER.size
+        yield view[position : position + length]
+        position += length
+
+
+class AudioArchive:
+    """
+    Archive of incoming audio streams stored in rolling segment files.
+
+    :param path: The directory where the archive is stored.
+    :param segment_size: The size in bytes after which a new segment is started.
+    :param get_current_time: A function that returns the current time in seconds.
+
+    """
+
+    def __init__(
+        self,
+        path: str,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        get_current_time: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.segment_size = segment_size
+        self.get_current_time = get_current_time
+        self.maps = dict()
+        os.makedirs(path, exist_ok=True)
+
+        strings_path = os.path.join(path, STRINGS_FILENAME)
+        self.strings = []
+        if os.path.exists(strings_path):
+            with open(strings_path, "rb") as f:
+                self.strings, end = decode_strings(f.read())
+            truncate_to(strings_path, end)
+        self.string_ids = {string: i for i, string in enumerate(self.strings)}
+        self.strings_file = open(strings_path, "ab")
+
+        self.index_path = os.path.join(path, INDEX_FILENAME)
+        if os.path.exists(self.index_path):
+            size = os.path.getsize(self.index_path)
+            truncate_to(self.index_path, size - size % INDEX_RECORD.itemsize)
+        self.index_file = open(self.index_path, "ab")
+        self.records = self.map_index()
+        self.count = len(self.records)
+
+        if self.count:
+            durations = self.records["end_time"] - self.records["start_time"]
+            self.max_duration = float(durations.max())
+            self.last_end_time = float(self.records["end_time"][-1])
+            self.segment = int(self.records["segment"][-1])
+        else:
+            self.max_duration = 0.0
+            self.last_end_time = float("-inf")
+            self.segment = 0
+        self.segment_file = open(self.segment_path(self.segment), "ab")
+
+    def segment_path(self, segment):
+        return os.path.join(self.path, SEGMENT_FILENAME.format(segment))
+
+    def close(self):
+        self.strings_file.close()
+        self.index_file.close()
+        self.segment_file.close()
+        # Maps with slices still referenced are released when those are
+        self.records = np.zeros(0, dtype=INDEX_RECORD)
+        self.maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def map_index(self):
+        size = os.path.getsize(self.index_path)
+        if not size:
+            return np.zeros(0, dtype=INDEX_RECORD)
+        with open(self.index_path, "rb") as f:
+            index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return np.frombuffer(
+            index_map, dtype=INDEX_RECORD, count=size // INDEX_RECORD.itemsize
+        )
+
+    def get_records(self):
+        if len(self.records) < self.count:
+            self.index_file.flush()
+            self.records = self.map_index()
+        return self.records
+
+    def string_id(self, string):
+        string_id = self.string_ids.get(string)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings_file.write(encode_string(string))
+            self.strings.append(string)
+            self.string_ids[string] = string_id
+        return string_id
+
+    def to_entry(self, record):
+        *fields, channel, from_ = record.item()
+        return ArchiveEntry(*fields, self.strings[channel], self.strings[from_])
+
+    def append(
+        self, stream_id, stream, packets, start_time, end_time
+    ) -> Optional[ArchiveEntry]:
+        """
+        Appends the packets of a finished stream to the archive.
+
+        """
+        if not packets:
+            return None
+        data = encode_packets(packets)
+        offset = self.segment_file.tell()
+        if offset and offset + len(data) > self.segment_size:
+            self.segment_file.close()
+            self.segment += 1
+            self.segment_file = open(self.segment_path(self.segment), "ab")
+            offset = 0
+        self.segment_file.write(data)
+        self.segment_file.flush()
+
+        # The index must stay ordered by end time, even if the clock goes back
+        end_time = max(end_time, self.last_end_time)
+        record = np.array(
+            (
+                stream_id,
+                start_time,
+                end_time,
+                self.segment,
+                offset,
+                len(data),
+                stream.sample_rate_hz,
+                stream.frames_per_packet,
+                stream.frame_size_ms,
+                self.string_id(stream.channel or ""),
+                self.string_id(stream.from_ or ""),
+            ),
+            dtype=INDEX_RECORD,
+        )
+        # Strings go to disk before the records referencing them
+        self.strings_file.flush()
+        self.index_file.write(record.tobytes())
+        self.index_file.flush()
+        self.count += 1
+        self.last_end_time = end_time
+        self.max_duration = max(self.max_duration, end_time - start_time)
+        return self.to_entry(record)
+
+    async def record(self, stream_id, stream):
+        """
+        Archives `stream` once it ends.
+
+        Has the same signature as the `on_stream` callback so it can be used
+        directly as one.
+
+        """
+        start_time = self.get_current_time()
+        packets = [packet async for packet in stream.packets()]
+        return self.append(
+            stream_id, stream, packets, start_time, self.get_current_time()
+        )
+
+    def find(self, start=None, end=None, channel=None, from_=None):
+        """
+        Returns the archived streams overlapping the given time range, in
+        order of start time, optionally filtered by channel and sender.
+
+        """
+        records = self.get_records()
+        lower = 0
+        upper = len(records)
+        # Records are ordered by end time and no stream lasts longer than
+        # max_duration, so any stream overlapping the range ended at most
+        # max_duration after `end`
+        if start is not None:
+            lower = np.searchsorted(records["end_time"], start, side="left")
+        if end is not None:
+            upper = np.searchsorted(
+                records["end_time"], end + self.max_duration, side="right"
+            )
+        records = records[lower:upper]
+        if end is not None:
+            records = records[records["start_time"] <= end]
+        for field, string in (("channel", channel), ("from_", from_)):
+            if string is not None:
+                if string not in self.string_ids:
+                    return []
+                records = records[records[field] == self.string_ids[string]]
+        order = np.argsort(records["start_time"], kind="stable")
+        return [self.to_entry(record) for record in records[order]]
+
+    def get_map(self, segment, size):
+        cached = self.maps.get(segment)
+        if cached is None or len(cached) < size:
+            if segment == self.segment:
+                self.segment_file.flush()
+            with open(self.segment_path(segment), "rb") as f:
+                cached = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[segment] = cached
+        return cached
+
+    def read(self, entry):
+        """
+        Returns the length-prefixed packets of `entry` as a `memoryview` of
+        the mapped segment.
+
+        """
+        segment_map = self.get_map(entry.segment, entry.offset + entry.length)
+        return memoryview(segment_map)[entry.offset : entry.offset + entry.length]
+
+    def packets(self, entry):
+        """
+        Yields the Opus packets of `entry` as `memoryview` slices.
+
+        """
+        return iter_packets(self.read(entry))
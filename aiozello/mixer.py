@@ -0,0 +1,220 @@
+"""
+This module contains the classes related to mixing several incoming audio
+streams into a single monitoring feed.
+
+The :class:`AudioMixer` class consumes any number of
+:class:`~aiozello.stream.IncomingAudioStream` objects, resamples their decoded
+PCM to a common rate and sums them on a fixed clock.
+
+"""
+import asyncio
+
+import numpy as np
+
+
+INT16_MIN = -(2**15)
+INT16_MAX = 2**15 - 1
+
+
+def mix_frames(frames, frame_samples):
+    """
+    Sums several 16-bit PCM frames and clips the result to the 16-bit range.
+
+    Frames shorter than `frame_samples` are treated as padded with silence.
+
+    :param frames: An iterable of `numpy.int16` arrays.
+    :param frame_samples: The number of samples of the output frame.
+
+    """
+    acc = np.zeros(frame_samples, dtype=np.int32)
+    for frame in frames:
+        acc[: len(frame)] += frame
+    return np.clip(acc, INT16_MIN, INT16_MAX).astype(np.int16)
+
+
+class Resampler:
+    """
+    Linear interpolation resampler for a continuous stream of 16-bit PCM
+    chunks.
+
+    The position and the last sample of the previous chunk are kept between
+    calls so there are no discontinuities at chunk boundaries.
+
+    :param from_hz: The sample rate of the input.
+    :param to_hz: The sample rate of the output.
+
+    """
+
+    def __init__(self, from_hz: int, to_hz: int):
+        self.from_hz = from_hz
+        self.to_hz = to_hz
+        self.step = from_hz / to_hz
+        self.position = 0.0
+        self.last_sample = 0
+
+    def resample(self, pcm):
+        if self.from_hz == self.to_hz or len(pcm) == 0:
+            return pcm
+        # Index -1 is the last sample of the previous chunk
+        xp = np.arange(-1, len(pcm))
+        fp = np.concatenate(([self.last_sample], pcm))
+        count = int(np.floor((len(pcm) - 1 - self.position) / self.step)) + 1
+        if count <= 0:
+            self.position -= len(pcm)
+            self.last_sample = pcm[-1]
+            return np.zeros(0, dtype=np.int16)
+        x = self.position + np.arange(count) * self.step
+        self.position = self.position + count * self.step - len(pcm)
+        self.last_sample = pcm[-1]
+        return np.round(np.interp(x, xp, fp)).astype(np.int16)
+
+
+class MixerInput:
+    """
+    Buffered PCM of a single stream being mixed.
+
+    The samples are kept in a preallocated ring buffer that never holds more
+    than `max_samples`; the oldest samples are dropped on overflow to keep the
+    latency bounded.
+
+    Nothing is popped until the buffer holds `prefill_samples`, both at the
+    start and every time it runs dry, so packets arriving slightly late don't
+    leave gaps in the output.
+
+    """
+
+    def __init__(self, max_samples: int, prefill_samples: int = 0):
+        self.max_samples = max_samples
+        self.prefill_samples = prefill_samples
+        self.buffer = np.zeros(max_samples, dtype=np.int16)
+        self.start = 0
+        self.length = 0
+        self.playing = False
+        self.finished = False
+
+    def __len__(self):
+        return self.length
+
+    def push(self, pcm):
+        pcm = pcm[-self.max_samples :]
+        end = (self.start + self.length) % self.max_samples
+        head = min(len(pcm), self.max_samples - end)
+        self.buffer[end : end + head] = pcm[:head]
+        self.buffer[: len(pcm) - head] = pcm[head:]
+        overflow = self.length + len(pcm) - self.max_samples
+        if overflow > 0:
+            self.start = (self.start + overflow) % self.max_samples
+        self.length = min(self.length + len(pcm), self.max_samples)
+
+    def pop(self, samples: int):
+        if not self.playing:
+            if self.length < self.prefill_samples and not self.finished:
+                return np.zeros(0, dtype=np.int16)
+            self.playing = True
+        samples = min(samples, self.length)
+        end = self.start + samples
+        if end <= self.max_samples:
+            frame = self.buffer[self.start : end].copy()
+        else:
+            frame = np.concatenate(
+                (self.buffer[self.start :], self.buffer[: end - self.max_samples])
+            )
+        self.start = end % self.max_samples
+        self.length -= samples
+        if self.length == 0:
+            self.playing = False
+        return frame
+
+
+class AudioMixer:
+    """
+    Mixes several incoming audio streams into a single stream of 16-bit mono
+    PCM frames.
+
+    Streams are added with :meth:`add`, which has the same signature as the
+    `on_stream` callback so it can be used directly as one.  Iterating the
+    mixer yields one frame of mixed PCM every `frame_size_ms` until
+    :meth:`close` is called.
+
+    :param sample_rate_hz: The sample rate of the mixed output.
+    :param frame_size_ms: The duration of every output frame in milliseconds.
+    :param max_latency_ms: The maximum amount of audio buffered per stream.
+    :param jitter_ms: The amount of audio buffered per stream before it is
+        mixed, to absorb late packets.
+
+    """
+
+    def __init__(
+        self,
+        sample_rate_hz: int = 16000,
+        frame_size_ms: int = 20,
+        max_latency_ms: int = 200,
+        jitter_ms: int = 120,
+    ):
+        self.sample_rate_hz = sample_rate_hz
+        self.frame_size_ms = frame_size_ms
+        self.frame_samples = sample_rate_hz * frame_size_ms // 1000
+        self.max_latency_ms = max_latency_ms
+        self.prefill_samples = sample_rate_hz * jitter_ms // 1000
+        self.max_samples = max(
+            sample_rate_hz * max_latency_ms // 1000,
+            self.prefill_samples + self.frame_samples,
+        )
+        self.inputs = dict()
+        self.closed = False
+
+    def add_input(self, stream_id):
+        """
+        Registers and returns the :class:`MixerInput` of a new stream.
+
+        """
+        mixer_input = MixerInput(self.max_samples, self.prefill_samples)
+        self.inputs[stream_id] = mixer_input
+        return mixer_input
+
+    async def add(self, stream_id, stream):
+        """
+        Decodes `stream` into the mixer until the stream ends.
+
+        """
+        mixer_input = self.add_input(stream_id)
+        resampler = Resampler(stream.sample_rate_hz, self.sample_rate_hz)
+        try:
+            async for pcm in stream.decode():
+                if self.closed:
+                    # Keep consuming so the stream queue doesn't grow unread
+                    await stream.drain()
+                    break
+                mixer_input.push(
+                    resampler.resample(np.frombuffer(pcm, dtype=np.int16))
+                )
+        finally:
+            mixer_input.finished = True
+
+    def close(self):
+        self.closed = True
+
+    def mix(self):
+        """
+        Pops one frame from every input and returns the mixed frame as bytes.
+
+        """
+        frames = [
+            mixer_input.pop(self.frame_samples) for mixer_input in self.inputs.values()
+        ]
+        for stream_id, mixer_input in list(self.inputs.items()):
+            if mixer_input.finished and not len(mixer_input):
+                del self.inputs[stream_id]
+        return mix_frames(frames, self.frame_samples).tobytes()
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        frame_duration = self.frame_size_ms / 1000
+        next_tick = loop.time()
+        while not self.closed:
+            next_tick += frame_duration
+            # Skip ahead instead of bursting frames if we fell too far behind
+            if loop.time() - next_tick > self.max_latency_ms / 1000:
+                next_tick = loop.time()
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+            yield self.mix()
@@ -59,22 +59,64 @@ class IncomingAudioStream:
 
     """
 
-    def __init__(self, sample_rate_hz, frames_per_packet, frame_size_ms):
+    def __init__(
+        self, sample_rate_hz, frames_per_packet, frame_size_ms, channel=None, from_=None
+    ):
         self.sample_rate_hz = sample_rate_hz
         self.frames_per_packet = frames_per_packet
         self.frame_size_ms = frame_size_ms
+        self.channel = channel
+        self.from_ = from_
         self.incoming = asyncio.Queue()
+        # Set to a StreamTrace when latency tracing is enabled, in which case
+        # the items in `incoming` are (packet, PacketStamp) pairs
+        self.trace = None
+
+    async def receive(self):
+        """
+        Yields (packet, stamp) pairs from the queue; stamp is None unless the
+        stream is being traced.
+        """
+        while True:
+            item = await self.incoming.get()
+            if item is None:
+                break
+            if self.trace is None:
+                yield item, None
+            else:
+                packet, stamp = item
+                self.trace.record(
+                    "queue", stamp.packet_id, stamp.received, self.trace.now()
+                )
+                yield packet, stamp
+
+    async def packets(self):
+        """
+        Yields the raw Opus packets of the stream until it ends.
+        """
+        async for packet, stamp in self.receive():
+            if stamp is None:
+                yield packet
+            else:
+                start = self.trace.now()
+                yield packet
+                self.trace.record("callback", stamp.packet_id, start, self.trace.now())
 
     async def decode(self):
         decoder = opuslib.Decoder(self.sample_rate_hz, 1)
         frame_size = (
             self.sample_rate_hz // 1000 * self.frame_size_ms
         ) * self.frames_per_packet
-        while True:
-            packet = await self.incoming.get()
-            if packet is None:
-                break
-            yield decoder.decode(packet, frame_size)
+        async for packet, stamp in self.receive():
+            if stamp is None:
+                yield decoder.decode(packet, frame_size)
+            else:
+                start = self.trace.now()
+                pcm = decoder.decode(packet, frame_size)
+                end = self.trace.now()
+                self.trace.record("decode", stamp.packet_id, start, end)
+                yield pcm
+                self.trace.record("callback", stamp.packet_id, end, self.trace.now())
 
     async def drain(self):
         while True:
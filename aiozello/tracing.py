@@ -0,0 +1,194 @@
+"""
+This module contains the classes related to latency tracing of incoming audio.
+
+When a :class:`LatencyTracer` is given to the application every binary frame
+is stamped on receipt, and the stamp travels with the packet through the
+stream queue and the decoder.  The delay of every stage is recorded into
+per-stream and aggregate :class:`LatencyHistogram` objects and, optionally,
+handed to span exporters as :class:`Span` objects.
+
+The stages are:
+
+- `network`: arrival delay of the packet relative to the earliest packet of
+  the stream, given the nominal packet duration (network jitter).
+- `queue`: time spent waiting in :attr:`IncomingAudioStream.incoming`.
+- `decode`: time spent decoding the Opus packet.
+- `callback`: time spent by the consumer of the stream before asking for the
+  next packet.
+
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+import bisect
+import time
+
+
+STAGES = ("network", "queue", "decode", "callback")
+
+# Bucket upper bounds in seconds, four per decade from 1us to 10s
+BUCKET_BOUNDS = tuple(10 ** (exponent / 4) for exponent in range(-24, 5))
+
+
+@dataclass(frozen=True)
+class Span:
+    """
+    A stage of the processing of a packet, with `start` and `end` in
+    wall-clock seconds since the epoch.
+
+    """
+
+    stream_id: int
+    packet_id: int
+    stage: str
+    start: float
+    end: float
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+@dataclass
+class PacketStamp:
+    packet_id: int
+    received: float
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with logarithmic buckets.
+
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, latency: float):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the `q` percentile.
+
+        """
+        if not self.count:
+            return 0.0
+        threshold = self.count * q / 100
+        accumulated = 0
+        for bound, bucket in zip(BUCKET_BOUNDS, self.buckets):
+            accumulated += bucket
+            if accumulated >= threshold:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+def new_histograms():
+    return {stage: LatencyHistogram() for stage in STAGES}
+
+
+class StreamTrace:
+    """
+    Records the latencies of a single stream.
+
+    """
+
+    def __init__(self, tracer, stream_id, packet_duration):
+        self.tracer = tracer
+        self.stream_id = stream_id
+        self.packet_duration = packet_duration
+        self.histograms = new_histograms()
+        self.base_time = None
+
+    def now(self):
+        return self.tracer.get_current_time()
+
+    def record(self, stage, packet_id, start, end):
+        latency = end - start
+        self.histograms[stage].record(latency)
+        self.tracer.histograms[stage].record(latency)
+        if self.tracer.exporters:
+            offset = self.tracer.wall_clock_offset
+            span = Span(self.stream_id, packet_id, stage, start + offset, end + offset)
+            for exporter in self.tracer.exporters:
+                exporter(span)
+
+    def received(self, packet_id, received):
+        """
+        Stamps a packet on receipt and records its network delay.
+
+        """
+        expected = packet_id * self.packet_duration
+        if self.base_time is None or received - expected < self.base_time:
+            self.base_time = received - expected
+        self.record("network", packet_id, self.base_time + expected, received)
+        return PacketStamp(packet_id, received)
+
+
+class LatencyTracer:
+    """
+    Collects per-stage latencies of incoming audio streams.
+
+    :param exporters: Functions called with every recorded :class:`Span`.
+    :param get_current_time: A monotonic function returning time in seconds.
+    :param get_wall_time: A function returning seconds since the epoch, used
+        to convert the monotonic times of exported spans to wall-clock time.
+    :param max_streams: Number of most recent streams whose histograms are kept.
+
+    """
+
+    def __init__(
+        self,
+        exporters: Optional[Iterable[Callable[[Span], None]]] = None,
+        get_current_time: Callable[[], float] = time.perf_counter,
+        get_wall_time: Callable[[], float] = time.time,
+        max_streams: int = 1000,
+    ):
+        self.exporters = list(exporters or [])
+        self.get_current_time = get_current_time
+        self.wall_clock_offset = get_wall_time() - get_current_time()
+        self.max_streams = max_streams
+        self.histograms = new_histograms()
+        self.streams = OrderedDict()
+
+    def now(self):
+        return self.get_current_time()
+
+    def stream(self, stream_id, stream):
+        """
+        Returns the :class:`StreamTrace` for a newly started stream.
+
+        """
+        packet_duration = stream.frames_per_packet * stream.frame_size_ms / 1000
+        trace = StreamTrace(self, stream_id, packet_duration)
+        self.streams[stream_id] = trace
+        while len(self.streams) > self.max_streams:
+            self.streams.popitem(last=False)
+        return trace
+
+    def report(self, stream_id=None):
+        """
+        Returns a summary of every stage, either aggregated or for a single
+        stream.
+
+        """
+        if stream_id is None:
+            histograms = self.histograms
+        else:
+            histograms = self.streams[stream_id].histograms
+        return {stage: histogram.summary() for stage, histogram in histograms.items()}
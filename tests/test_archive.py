@@ -0,0 +1,123 @@
+import asyncio
+import os
+import tempfile
+
+from hypothesis import given, strategies as st
+
+from aiozello.archive import (
+    INDEX_FILENAME,
+    STRINGS_FILENAME,
+    AudioArchive,
+    decode_strings,
+    encode_packets,
+    encode_string,
+    iter_packets,
+)
+
+
+class FakeStream:
+    sample_rate_hz = 16000
+    frames_per_packet = 1
+    frame_size_ms = 60
+
+    def __init__(self, packets, channel="test", from_="alice"):
+        self.channel = channel
+        self.from_ = from_
+        self._packets = packets
+
+    async def packets(self):
+        for packet in self._packets:
+            yield packet
+
+
+@given(packets=st.lists(st.binary(max_size=1500)))
+def test_encode_packets_iter_packets_isomorphism(packets):
+    assert [bytes(p) for p in iter_packets(encode_packets(packets))] == packets
+
+
+@given(strings=st.lists(st.text(max_size=100)))
+def test_encode_string_decode_strings_isomorphism(strings):
+    data = b"".join(encode_string(string) for string in strings)
+    assert decode_strings(data) == (strings, len(data))
+    if data:
+        assert decode_strings(data[:-1])[0] == strings[:-1]
+
+
+def test_AudioArchive_record_find_read():
+    clock = iter(range(100))
+    with tempfile.TemporaryDirectory() as path:
+        with AudioArchive(
+            path, segment_size=16, get_current_time=lambda: next(clock)
+        ) as archive:
+            asyncio.run(archive.record(1, FakeStream([b"one", b"two"])))
+            asyncio.run(archive.record(2, FakeStream([b"three"], from_="bob")))
+
+            entries = archive.find()
+            assert [entry.stream_id for entry in entries] == [1, 2]
+            assert [entry.segment for entry in entries] == [0, 1]
+            assert [bytes(p) for p in archive.packets(entries[0])] == [b"one", b"two"]
+            assert archive.find(start=2) == entries[1:]
+            assert archive.find(end=1) == entries[:1]
+            assert archive.find(from_="bob") == entries[1:]
+
+        with AudioArchive(path) as archive:
+            assert archive.find() == entries
+            assert [bytes(p) for p in archive.packets(entries[1])] == [b"three"]
+
+
+def test_AudioArchive_recovers_from_truncated_index():
+    with tempfile.TemporaryDirectory() as path:
+        with AudioArchive(path) as archive:
+            asyncio.run(archive.record(1, FakeStream([b"one"])))
+        index_path = os.path.join(path, INDEX_FILENAME)
+        os.truncate(index_path, os.path.getsize(index_path) - 3)
+
+        with AudioArchive(path) as archive:
+            assert archive.find() == []
+            asyncio.run(archive.record(2, FakeStream([b"two"])))
+            asyncio.run(archive.record(3, FakeStream([b"three"])))
+
+        with AudioArchive(path) as archive:
+            entries = archive.find()
+            assert [entry.stream_id for entry in entries] == [2, 3]
+            assert [bytes(p) for p in archive.packets(entries[1])] == [b"three"]
+
+
+def test_AudioArchive_find_bounds_by_longest_stream():
+    clock = iter([0, 10, 20, 21, 30, 31])
+    with tempfile.TemporaryDirectory() as path:
+        with AudioArchive(path, get_current_time=lambda: next(clock)) as archive:
+            for stream_id in range(3):
+                asyncio.run(archive.record(stream_id, FakeStream([b"x"])))
+            assert archive.max_duration == 10
+            assert [entry.stream_id for entry in archive.find(start=5)] == [0, 1, 2]
+            assert [entry.stream_id for entry in archive.find(start=11)] == [1, 2]
+            assert [entry.stream_id for entry in archive.find(start=25, end=30)] == [2]
+
+
+def test_AudioArchive_recovers_from_truncated_strings():
+    with tempfile.TemporaryDirectory() as path:
+        with AudioArchive(path) as archive:
+            asyncio.run(archive.record(1, FakeStream([b"one"])))
+        strings_path = os.path.join(path, STRINGS_FILENAME)
+        with open(strings_path, "ab") as f:
+            f.write(encode_string("partial")[:-2])
+
+        with AudioArchive(path) as archive:
+            asyncio.run(archive.record(2, FakeStream([b"two"], from_="bob")))
+
+        with AudioArchive(path) as archive:
+            assert [entry.from_ for entry in archive.find()] == ["alice", "bob"]
+
+
+def test_AudioArchive_find_streams_ending_out_of_start_order():
+    with tempfile.TemporaryDirectory() as path:
+        with AudioArchive(path) as archive:
+            short = archive.append(1, FakeStream([]), [b"x"], 10.0, 20.0)
+            long = archive.append(2, FakeStream([]), [b"y"], 0.0, 50.0)
+
+            assert archive.find() == [long, short]
+            assert archive.find(start=30) == [long]
+            assert archive.find(end=5) == [long]
+            assert archive.find(start=15, end=18) == [long, short]
+            assert archive.find(channel="other") == []
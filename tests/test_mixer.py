@@ -0,0 +1,107 @@
+import asyncio
+
+from hypothesis import given, strategies as st
+import numpy as np
+
+from aiozello.mixer import AudioMixer, MixerInput, Resampler, mix_frames
+
+
+class FakeStream:
+    def __init__(self, sample_rate_hz, chunks):
+        self.sample_rate_hz = sample_rate_hz
+        self.chunks = chunks
+        self.drained = False
+
+    async def decode(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def drain(self):
+        self.drained = True
+
+
+def test_mix_frames_clips_to_int16():
+    loud = np.full(4, 30000, dtype=np.int16)
+    quiet = np.full(2, -30000, dtype=np.int16)
+    mixed = mix_frames([loud, loud, quiet], 4)
+    assert mixed.tolist() == [30000, 30000, 32767, 32767]
+
+
+@given(
+    operations=st.lists(
+        st.one_of(
+            st.lists(st.integers(min_value=-(2**15), max_value=2**15 - 1), max_size=20),
+            st.integers(min_value=0, max_value=20),
+        )
+    )
+)
+def test_mixer_input_behaves_like_bounded_fifo(operations):
+    mixer_input = MixerInput(8)
+    expected = []
+    for operation in operations:
+        if isinstance(operation, list):
+            mixer_input.push(np.array(operation, dtype=np.int16))
+            expected = (expected + operation)[-8:]
+        else:
+            assert mixer_input.pop(operation).tolist() == expected[:operation]
+            expected = expected[operation:]
+        assert len(mixer_input) == len(expected)
+
+
+@given(
+    from_hz=st.sampled_from([8000, 12000, 16000, 24000, 48000]),
+    to_hz=st.sampled_from([8000, 12000, 16000, 24000, 48000]),
+    chunks=st.lists(st.integers(min_value=1, max_value=960), min_size=1),
+)
+def test_resampler_output_length_tracks_rate(from_hz, to_hz, chunks):
+    resampler = Resampler(from_hz, to_hz)
+    total = sum(
+        len(resampler.resample(np.zeros(chunk, dtype=np.int16))) for chunk in chunks
+    )
+    expected = sum(chunks) * to_hz / from_hz
+    # Output lags the input by at most one input sample
+    assert abs(total - expected) <= to_hz / from_hz + 1
+
+
+def test_AudioMixer_sums_streams():
+    async def run():
+        mixer = AudioMixer(sample_rate_hz=8000, frame_size_ms=10)
+        one = np.full(80, 100, dtype=np.int16).tobytes()
+        await mixer.add(1, FakeStream(8000, [one]))
+        await mixer.add(2, FakeStream(16000, [one + one]))
+        mixed = np.frombuffer(mixer.mix(), dtype=np.int16)
+        assert len(mixed) == 80
+        assert mixed[-1] == 200
+        assert not mixer.inputs
+
+    asyncio.run(run())
+
+
+def test_AudioMixer_drains_streams_after_close():
+    async def run():
+        mixer = AudioMixer(sample_rate_hz=8000, frame_size_ms=10)
+        mixer.close()
+        stream = FakeStream(8000, [np.zeros(80, dtype=np.int16).tobytes()])
+        await mixer.add(1, stream)
+        assert stream.drained
+
+    asyncio.run(run())
+
+
+def mix_with_late_packets(jitter_ms):
+    # 60ms chunks, every other one delivered two 20ms ticks late
+    mixer = AudioMixer(sample_rate_hz=8000, frame_size_ms=20, jitter_ms=jitter_ms)
+    mixer_input = mixer.add_input(1)
+    arrivals = {3 * k + (2 if k % 2 else 0): k for k in range(10)}
+    frames = []
+    for tick in range(30):
+        if tick in arrivals:
+            mixer_input.push(np.full(480, 100, dtype=np.int16))
+        frames.append(np.frombuffer(mixer.mix(), dtype=np.int16))
+    first = next(i for i, frame in enumerate(frames) if frame.any())
+    return frames[first:]
+
+
+def test_AudioMixer_jitter_buffer_absorbs_late_packets():
+    assert all((frame == 100).all() for frame in mix_with_late_packets(100))
+    assert not all((frame == 100).all() for frame in mix_with_late_packets(0))
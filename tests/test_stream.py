@@ -1,6 +1,10 @@
+import asyncio
+
+import opuslib
 from hypothesis import given, strategies as st
 
-from aiozello.stream import encode_audio_packet, encode_image_packet, decode_stream_packet, PacketType
+from aiozello.stream import encode_audio_packet, encode_image_packet, decode_stream_packet, PacketType, IncomingAudioStream
+from aiozello.tracing import LatencyTracer
 
 
 @given(stream_id=st.integers(min_value=0, max_value=2**32-1),
@@ -21,3 +25,44 @@ def test_encode_image_packet_decode_isomorphism(image_id, image_type, data):
     packet_type, *decoded = decode_stream_packet(encoded)
     assert packet_type is PacketType.IMAGE
     assert decoded == [image_id, image_type, data]
+
+
+def test_IncomingAudioStream_packets_traces_queue_and_callback():
+    clock = iter(range(100))
+    tracer = LatencyTracer(get_current_time=lambda: next(clock))
+    stream = IncomingAudioStream(16000, 1, 20)
+    stream.trace = tracer.stream(1, stream)
+
+    async def run():
+        for packet_id, data in enumerate([b"one", b"two"]):
+            await stream.incoming.put((data, stream.trace.received(packet_id, tracer.now())))
+        await stream.incoming.put(None)
+        return [packet async for packet in stream.packets()]
+
+    assert asyncio.run(run()) == [b"one", b"two"]
+    report = tracer.report(1)
+    assert report["queue"]["count"] == 2
+    assert report["callback"]["count"] == 2
+    assert report["decode"]["count"] == 0
+
+
+def test_IncomingAudioStream_decode_traces_decode_and_callback():
+    clock = iter(range(100))
+    tracer = LatencyTracer(get_current_time=lambda: next(clock))
+    stream = IncomingAudioStream(16000, 1, 20)
+    stream.trace = tracer.stream(1, stream)
+    encoder = opuslib.Encoder(16000, 1, opuslib.APPLICATION_VOIP)
+    packet = encoder.encode(bytes(640), 320)
+
+    async def run():
+        for packet_id in range(2):
+            await stream.incoming.put((packet, stream.trace.received(packet_id, tracer.now())))
+        await stream.incoming.put(None)
+        return [pcm async for pcm in stream.decode()]
+
+    assert [len(pcm) for pcm in asyncio.run(run())] == [640, 640]
+    report = tracer.report(1)
+    assert report["queue"]["count"] == 2
+    assert report["decode"]["count"] == 2
+    assert report["callback"]["count"] == 2
+    assert report["decode"]["max"] == 1
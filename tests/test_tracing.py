@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from hypothesis import given, strategies as st
+
+from aiozello.tracing import LatencyHistogram, LatencyTracer
+
+
+@given(latencies=st.lists(st.floats(min_value=0, max_value=60), min_size=1))
+def test_LatencyHistogram_percentiles_are_bounded(latencies):
+    histogram = LatencyHistogram()
+    for latency in latencies:
+        histogram.record(latency)
+    assert histogram.count == len(latencies)
+    assert histogram.max == max(latencies)
+    assert histogram.percentile(50) <= histogram.percentile(99) <= max(latencies)
+
+
+def test_LatencyTracer_network_delay_is_relative_to_earliest_packet():
+    spans = []
+    tracer = LatencyTracer(
+        exporters=[spans.append],
+        get_current_time=lambda: 0.0,
+        get_wall_time=lambda: 0.0,
+    )
+    stream = SimpleNamespace(frames_per_packet=1, frame_size_ms=20)
+    trace = tracer.stream(7, stream)
+
+    trace.received(0, 10.0)
+    trace.received(1, 10.05)
+    trace.received(2, 10.04)
+
+    assert [round(span.duration, 6) for span in spans] == [0.0, 0.03, 0.0]
+    assert {span.stream_id for span in spans} == {7}
+    assert tracer.report(7)["network"]["count"] == 3
+    assert tracer.report()["network"]["max"] == spans[1].duration
+
+
+def test_LatencyTracer_keeps_most_recent_streams():
+    tracer = LatencyTracer(max_streams=2)
+    stream = SimpleNamespace(frames_per_packet=1, frame_size_ms=20)
+    for stream_id in range(3):
+        tracer.stream(stream_id, stream)
+    assert list(tracer.streams) == [1, 2]
+
+
+def test_LatencyTracer_exports_spans_in_wall_clock_time():
+    spans = []
+    tracer = LatencyTracer(
+        exporters=[spans.append],
+        get_current_time=lambda: 5.0,
+        get_wall_time=lambda: 1000.0,
+    )
+    stream = SimpleNamespace(frames_per_packet=1, frame_size_ms=20)
+    trace = tracer.stream(1, stream)
+
+    trace.record("decode", 0, 5.0, 5.5)
+
+    assert (spans[0].start, spans[0].end) == (1000.0, 1000.5)
+    assert tracer.report(1)["decode"]["max"] == 0.5